@@ -1,12 +1,14 @@
 import sys
 import os
 import re
-import subprocess
-import tempfile
-import argparse
-import shutil
+import hashlib
 from enum import Enum, auto
 
+__version__ = "1.0.0"
+
+# Per-user cache for parsed ASTs
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "superhero")
+
 class TokenType(Enum):
     COMMENT = auto()
     IRONMAN = auto()
@@ -38,65 +40,144 @@ class TokenType(Enum):
     INTO = auto()
     CELL_REF = auto()
 
+# Tokens that declare labels, flash loops or arrays
+DECLARATION_TYPES = frozenset((TokenType.FALCON, TokenType.FLASH, TokenType.DOCTORSTRANGE))
+
+# Declarations that end a one-line flash body written on its header line
+FLASH_BODY_TERMINATORS = frozenset((TokenType.FALCON, TokenType.FLASH))
+
 class Token:
     """A token in the SuperHero language"""
+    __slots__ = ('type', 'value', 'line_number', 'indentation', 'indented')
+    
     def __init__(self, token_type, value=None, line_number=0):
         self.type = token_type
         self.value = value
         self.line_number = line_number
+        self.indentation = 0  # Set by the lexer on the first token of each line
+        self.indented = False  # Whether that line has any leading whitespace at all
     
     def __str__(self):
         return f"Token({self.type}, {self.value}, line {self.line_number})"
 
+# Superhero keywords and the token types they produce
+KEYWORDS = {
+    "ironman": TokenType.IRONMAN,
+    "batman": TokenType.BATMAN,
+    "superman": TokenType.SUPERMAN,
+    "wonderwoman": TokenType.WONDERWOMAN,
+    "flash": TokenType.FLASH,
+    "spiderman": TokenType.SPIDERMAN,
+    "thor": TokenType.THOR,
+    "thornum": TokenType.THORNUM,
+    "hulk": TokenType.HULK,
+    "doctorstrange": TokenType.DOCTORSTRANGE,
+    "blackpanther": TokenType.BLACKPANTHER,
+    "captainamerica": TokenType.CAPTAINAMERICA,
+    "vision": TokenType.VISION,
+    "starlord": TokenType.STARLORD,
+    "deadpool": TokenType.DEADPOOL,
+    "loki": TokenType.LOKI,
+    "falcon": TokenType.FALCON,
+    "hawkeye": TokenType.HAWKEYE,
+    "thanos": TokenType.THANOS,
+    "add": TokenType.ADD,
+    "sub": TokenType.SUB,
+    "into": TokenType.INTO,
+    "empty": TokenType.EMPTY
+}
+
+# Comparison operators and their C spelling
+OPERATORS = {
+    ">": ">",
+    "<": "<",
+    "=": "==",
+    "==": "==",
+    "!=": "!=",
+    ">=": ">=",
+    "<=": "<="
+}
+
+def _trie_pattern(trie):
+    """Render a keyword trie as a regex sharing common prefixes between keywords"""
+    branches = [re.escape(char) + _trie_pattern(child)
+                for char, child in sorted((k, v) for k, v in trie.items() if k is not None)]
+    if not branches:
+        return ""
+    pattern = "(?:" + "|".join(branches) + ")" if len(branches) > 1 else branches[0]
+    if None in trie:
+        # A keyword ends here; longer keywords are tried first
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+def _keyword_trie(keywords):
+    """Build a trie with one nested dict level per character; None marks a keyword end"""
+    trie = {}
+    for word, token_type in keywords.items():
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = token_type
+    return trie
+
+KEYWORD_TRIE = _keyword_trie(KEYWORDS)
+
+# Master pattern for a single line, compiled once at import. Whitespace and other
+# characters matching no group are skipped by finditer without producing a match
+# object. Keywords are recognised by the trie-shaped KW group while scanning, so
+# plain identifiers never need a keyword lookup.
+MASTER_RE = re.compile(
+    r'(?P<STR>"[^"\\]*(?:\\.[^"\\]*)*")'  # runs of plain chars eaten in one step
+    r'|(?P<BADSTR>")'
+    r'|(?P<NUM>[0-9]+)'  # ASCII digits only, so int() always accepts the match
+    r'|(?P<CELL>#[\w#]*)'
+    r'|(?P<KW>' + _trie_pattern(KEYWORD_TRIE) + r')(?![\w#])'
+    r'|(?P<WORD>[^\W\d][\w#]*)'  # Identifiers may use any Unicode letter
+    r'|(?P<OP><=|>=|==|!=|<|>|=)'
+    r'|(?P<BADOP>!)'
+    r'|(?P<COLON>:)'
+)
+
 class SuperHeroLexer:
     """Lexer for the SuperHero Programming Language"""
     
     def __init__(self):
-        self.keywords = {
-            "ironman": TokenType.IRONMAN,
-            "batman": TokenType.BATMAN,
-            "superman": TokenType.SUPERMAN,
-            "wonderwoman": TokenType.WONDERWOMAN,
-            "flash": TokenType.FLASH,
-            "spiderman": TokenType.SPIDERMAN,
-            "thor": TokenType.THOR,
-            "thornum": TokenType.THORNUM,
-            "hulk": TokenType.HULK,
-            "doctorstrange": TokenType.DOCTORSTRANGE,
-            "blackpanther": TokenType.BLACKPANTHER,
-            "captainamerica": TokenType.CAPTAINAMERICA,
-            "vision": TokenType.VISION,
-            "starlord": TokenType.STARLORD,
-            "deadpool": TokenType.DEADPOOL,
-            "loki": TokenType.LOKI,
-            "falcon": TokenType.FALCON,
-            "hawkeye": TokenType.HAWKEYE,
-            "thanos": TokenType.THANOS,
-            "add": TokenType.ADD,
-            "sub": TokenType.SUB,
-            "into": TokenType.INTO,
-            "empty": TokenType.EMPTY
-        }
+        self.keywords = KEYWORDS
+        self.operators = OPERATORS
         
-        self.operators = {
-            ">": ">",
-            "<": "<",
-            "=": "==",
-            "==": "==",
-            "!=": "!=",
-            ">=": ">=",
-            "<=": "<="
-        }
+        # Indices of falcon/flash/doctorstrange tokens from the last tokenize call,
+        # so the parser's first pass does not have to rescan every token
+        self.declarations = []
     
     def tokenize(self, code):
         """Convert SuperHero code string into a list of tokens"""
-        lines = code.split('\n')
         tokens = []
+        append = tokens.append
+        declarations = self.declarations = []
         multiline_comment = False
         
-        for line_num, line in enumerate(lines, 1):
-            # Skip empty lines
-            if not line.strip():
+        # Bind lookups used for every lexeme to locals once per call
+        finditer = MASTER_RE.finditer
+        keywords = self.keywords
+        operators = self.operators
+        identifier_type = TokenType.IDENTIFIER
+        intern = sys.intern
+        
+        # Walk the source line by line by index instead of splitting it up front
+        pos = 0
+        line_num = 0
+        length = len(code)
+        
+        while pos < length:
+            newline = code.find('\n', pos)
+            end = length if newline == -1 else newline
+            line = code[pos:end]
+            pos = end + 1
+            line_num += 1
+            
+            # Count leading spaces for indentation; skip empty lines
+            indentation = len(line) - len(line.lstrip())
+            if indentation == len(line):
                 continue
                 
             # Handle multiline comments
@@ -105,124 +186,135 @@ class SuperHeroLexer:
                     multiline_comment = False
                 continue
                 
-            # Check for multiline comment start
-            if "heroes*" in line and not "*heroes" in line:
+            # Check for multiline comment start (only lines containing '*' can have a marker)
+            if '*' in line and "heroes*" in line and not "*heroes" in line:
                 multiline_comment = True
                 continue
                 
-            # Handle single line comments
-            if line.strip().startswith("hero>"):
+            # Handle single line comments, checked in place after the indentation
+            if line.startswith("hero>", indentation):
                 continue
-                
-            # Count leading spaces for indentation
-            indentation = len(line) - len(line.lstrip())
             
-            # Process the line
-            i = indentation
-            line_tokens = []
+            # Classify every lexeme of the line in a single regex pass
+            first = len(tokens)
             
-            while i < len(line):
-                char = line[i]
+            for match in finditer(line, indentation):
+                kind = match.lastgroup
+                word = match.group()
                 
-                # Skip spaces
-                if char.isspace():
-                    i += 1
-                    continue
+                if kind == 'WORD':
+                    # Interned so flash and name lookups downstream hash and compare by identity
+                    append(Token(identifier_type, intern(word), line_num))
                 
-                # Handle string literals
-                if char == '"':
-                    start = i
-                    i += 1
-                    while i < len(line) and line[i] != '"':
-                        if line[i] == '\\' and i + 1 < len(line):
-                            i += 2  # Skip escape sequence
-                        else:
-                            i += 1
-                    if i < len(line):  # Found closing quote
-                        string_value = line[start+1:i]
-                        line_tokens.append(Token(TokenType.STRING, string_value, line_num))
-                        i += 1
-                    else:
-                        print(f"Error: Unclosed string literal at line {line_num}")
-                        sys.exit(1)
-                    continue
+                elif kind == 'KW':
+                    token_type = keywords[word]
+                    if token_type in DECLARATION_TYPES:
+                        declarations.append(len(tokens))
+                    append(Token(token_type, word, line_num))
                 
-                # Handle numbers
-                if char.isdigit():
-                    start = i
-                    while i < len(line) and line[i].isdigit():
-                        i += 1
-                    num_value = int(line[start:i])
-                    line_tokens.append(Token(TokenType.NUMBER, num_value, line_num))
-                    continue
+                elif kind == 'NUM':
+                    append(Token(TokenType.NUMBER, int(word), line_num))
                 
-                # Handle identifiers and keywords
-                if char.isalpha() or char == '_' or char == '#':
-                    start = i
-                    while i < len(line) and (line[i].isalnum() or line[i] == '_' or line[i] == '#'):
-                        i += 1
-                    word = line[start:i]
-                    
-                    # Check if it's a cell reference with #
-                    if word.startswith('#'):
-                        try:
-                            cell_num = int(word[1:])
-                            line_tokens.append(Token(TokenType.CELL_REF, cell_num, line_num))
-                        except ValueError:
-                            print(f"Error: Invalid cell reference '{word}' at line {line_num}")
-                            sys.exit(1)
-                    # Otherwise check if it's a keyword or identifier
-                    elif word in self.keywords:
-                        line_tokens.append(Token(self.keywords[word], word, line_num))
-                    else:
-                        line_tokens.append(Token(TokenType.IDENTIFIER, word, line_num))
-                    continue
+                elif kind == 'STR':
+                    append(Token(TokenType.STRING, word[1:-1], line_num))
                 
-                # Handle operators
-                if char in "<>=!":
-                    start = i
-                    i += 1
-                    if i < len(line) and line[i] == '=':
-                        i += 1
-                    op = line[start:i]
-                    if op in self.operators:
-                        line_tokens.append(Token(TokenType.OPERATOR, self.operators[op], line_num))
-                    else:
-                        print(f"Error: Invalid operator '{op}' at line {line_num}")
+                elif kind == 'CELL':
+                    try:
+                        cell_num = int(word[1:])
+                        append(Token(TokenType.CELL_REF, cell_num, line_num))
+                    except ValueError:
+                        print(f"Error: Invalid cell reference '{word}' at line {line_num}")
                         sys.exit(1)
-                    continue
                 
-                # Handle colon for labels
-                if char == ':':
-                    line_tokens.append(Token(TokenType.IDENTIFIER, ':', line_num))
-                    i += 1
-                    continue
+                elif kind == 'OP':
+                    # The pattern only matches valid operators, so the table always hits
+                    append(Token(TokenType.OPERATOR, operators[word], line_num))
                 
-                # Skip other characters
-                i += 1
+                elif kind == 'COLON':
+                    append(Token(TokenType.IDENTIFIER, ':', line_num))
+                
+                elif kind == 'BADSTR':
+                    print(f"Error: Unclosed string literal at line {line_num}")
+                    sys.exit(1)
+                
+                elif kind == 'BADOP':
+                    print(f"Error: Invalid operator '{word}' at line {line_num}")
+                    sys.exit(1)
             
-            # Add indentation information
-            if line_tokens:
-                line_tokens[0].indentation = indentation // 4  # Assuming 4 spaces per indentation level
-                tokens.extend(line_tokens)
+            # Add indentation information to the first token of the line
+            if len(tokens) > first:
+                line_start = tokens[first]
+                line_start.indentation = indentation // 4  # Assuming 4 spaces per indentation level
+                line_start.indented = indentation > 0  # Also true for tabs or fewer than 4 spaces
         
         return tokens
 
 class SuperHeroParser:
     """Parser for the SuperHero Programming Language"""
     
-    def __init__(self, tokens):
+    # Shared nodes for statements that take no operands (treat as read-only)
+    _NULLARY_NODES = {
+        TokenType.IRONMAN: {"type": "ironman"},
+        TokenType.BATMAN: {"type": "batman"},
+        TokenType.SUPERMAN: {"type": "superman"},
+        TokenType.WONDERWOMAN: {"type": "wonderwoman"},
+        TokenType.THOR: {"type": "thor"},
+        TokenType.THORNUM: {"type": "thornum"},
+        TokenType.DEADPOOL: {"type": "deadpool"},
+        TokenType.LOKI: {"type": "loki"},
+        TokenType.THANOS: {"type": "thanos"},
+    }
+    
+    def __init__(self, tokens, declarations=None):
         self.tokens = tokens
+        self.declarations = declarations  # Indices of declaration tokens, if known
         self.current = 0
         self.indent_stack = [0]
         self.labels = set()
+        self.label_scopes = {}  # Label name -> flashes defining it (None for the main program)
+        self.scope = None  # Flash whose body is being parsed, None for the main program
         self.flashes = {}  # Flash loops
+        self.flash_definitions = {}  # Flash token -> body tokens, for skipping definitions
+        self.flash_bodies = {}  # Flash loop name -> parsed body
         self.doctorstranges = {}  # Doctor Strange arrays
+        
+        # Statement handlers keyed by the token that starts the statement
+        self._dispatch = {
+            TokenType.HULK: self.parse_hulk,
+            TokenType.DOCTORSTRANGE: self.parse_doctorstrange,
+            TokenType.BLACKPANTHER: self.parse_blackpanther,
+            TokenType.CAPTAINAMERICA: self.parse_captainamerica,
+            TokenType.STARLORD: self.parse_starlord,
+            TokenType.FALCON: self.parse_falcon,
+            TokenType.HAWKEYE: self.parse_hawkeye,
+            TokenType.SPIDERMAN: self.parse_spiderman,
+            TokenType.ADD: self.parse_arithmetic,
+            TokenType.SUB: self.parse_arithmetic,
+            TokenType.IDENTIFIER: self.parse_identifier,
+            TokenType.FLASH: self.parse_flash,
+        }
     
     def parse(self):
         """Parse the tokens into an AST or intermediate representation"""
-        code_blocks = []
         self.first_pass()  # Collect all labels and flash loops
+        code_blocks = self.parse_block()
+        
+        # Flash bodies are compiled into their own functions, so parse each one separately
+        main_tokens = self.tokens
+        for name, body in self.flashes.items():
+            self.tokens = body
+            self.current = 0
+            self.scope = name
+            self.flash_bodies[name] = self.parse_block()
+        self.tokens = main_tokens
+        self.current = len(main_tokens)
+        self.scope = None
+        
+        return code_blocks
+    
+    def parse_block(self):
+        """Parse statements from the current token to the end of the token list"""
+        code_blocks = []
         
         while not self.is_at_end():
             statement = self.parse_statement()
@@ -233,18 +325,25 @@ class SuperHeroParser:
     
     def first_pass(self):
         """First pass to collect all labels and flash loops"""
-        i = 0
-        while i < len(self.tokens):
+        # Only declaration sites need inspecting. The lexer normally records them
+        # while scanning; otherwise gather their indices in one sweep.
+        declarations = self.declarations
+        if declarations is None:
+            declarations = [i for i, token in enumerate(self.tokens) if token.type in DECLARATION_TYPES]
+        
+        resume = 0  # Declarations before this index were skipped over (e.g. inside a flash body)
+        for i in declarations:
+            if i < resume:
+                continue
             token = self.tokens[i]
+            resume = i + 1
             
             # Collect falcon (label) declarations
             if token.type == TokenType.FALCON:
-                if i + 1 < len(self.tokens) and self.tokens[i + 1].type == TokenType.IDENTIFIER:
-                    label_name = self.tokens[i + 1].value
-                    if label_name.endswith(':'):
-                        label_name = label_name[:-1]
+                label_name = self.record_label(i, None)
+                if label_name:
                     self.labels.add(label_name)
-                i += 2  # Skip falcon and label name
+                resume = i + 3  # Skip falcon, label name and the colon
             
             # Collect flash (loop) definitions
             elif token.type == TokenType.FLASH:
@@ -253,18 +352,29 @@ class SuperHeroParser:
                     if flash_name.endswith(':'):
                         flash_name = flash_name[:-1]
                     
-                    # Collect the flash body
+                    # Collect the flash body: the rest of the header line (up to another
+                    # declaration) and the indented lines below it, up to the next line
+                    # without leading whitespace
                     flash_body = []
-                    i += 2  # Skip flash and name
+                    j = i + 2  # Skip flash and name
+                    line_number = token.line_number
                     
-                    # TODO: Proper indentation handling for flash bodies
-                    while i < len(self.tokens) and not (self.tokens[i].type in [TokenType.FALCON, TokenType.FLASH] and 
-                                                       getattr(self.tokens[i], 'indentation', 0) == 0):
-                        flash_body.append(self.tokens[i])
-                        i += 1
+                    while j < len(self.tokens):
+                        body_token = self.tokens[j]
+                        if body_token.line_number != line_number:
+                            if not body_token.indented:
+                                break
+                            line_number = body_token.line_number
+                        elif line_number == token.line_number and body_token.type in FLASH_BODY_TERMINATORS:
+                            break
+                        if body_token.type == TokenType.FALCON:
+                            self.record_label(j, flash_name)
+                        flash_body.append(body_token)
+                        j += 1
                     
                     self.flashes[flash_name] = flash_body
-                    continue  # We've already incremented i
+                    self.flash_definitions[token] = flash_body
+                    resume = j  # The terminating declaration is handled next
             
             # Collect doctorstrange (array) declarations
             elif token.type == TokenType.DOCTORSTRANGE:
@@ -283,8 +393,24 @@ class SuperHeroParser:
                     
                     if name:
                         self.doctorstranges[name] = size  # Size might be None
-            
-            i += 1
+    
+    def record_label(self, index, scope):
+        """Record the label declared by the falcon at index as defined in the given scope"""
+        if index + 1 < len(self.tokens) and self.tokens[index + 1].type == TokenType.IDENTIFIER:
+            label_name = self.tokens[index + 1].value
+            if label_name.endswith(':'):
+                label_name = label_name[:-1]
+            self.label_scopes.setdefault(label_name, set()).add(scope)
+            return label_name
+        return None
+    
+    def check_jump(self, token, target):
+        """Reject a jump to a label in another flash or the main program, which compile to separate C functions"""
+        scopes = self.label_scopes.get(target)
+        if scopes and self.scope not in scopes:
+            where = f"flash '{self.scope}'" if self.scope is not None else "the main program"
+            print(f"Error at line {token.line_number}: {token.value} cannot jump to label '{target}' outside {where}")
+            sys.exit(1)
     
     def is_at_end(self):
         """Check if we've reached the end of the tokens"""
@@ -336,212 +462,272 @@ class SuperHeroParser:
         if not token:
             return None
         
-        if token.type == TokenType.IRONMAN:
+        # Opcodes without operands reuse a single prebuilt node
+        node = self._NULLARY_NODES.get(token.type)
+        if node:
             self.advance()
-            return {"type": "ironman"}
+            return node
         
-        elif token.type == TokenType.BATMAN:
-            self.advance()
-            return {"type": "batman"}
-        
-        elif token.type == TokenType.SUPERMAN:
-            self.advance()
-            return {"type": "superman"}
+        handler = self._dispatch.get(token.type)
+        if handler:
+            return handler(token)
         
-        elif token.type == TokenType.WONDERWOMAN:
-            self.advance()
-            return {"type": "wonderwoman"}
+        # Skip unknown token
+        self.advance()
+        return None
+    
+    def parse_hulk(self, token):
+        """Parse a hulk statement with an optional value"""
+        self.advance()
+        args = []
+        if not self.is_at_end() and (self.peek().type == TokenType.STRING or self.peek().type == TokenType.NUMBER):
+            args.append(self.advance().value)
+        return {"type": "hulk", "args": args}
+    
+    def parse_doctorstrange(self, token):
+        """Parse a doctorstrange array declaration"""
+        self.advance()
+        size = None
+        name = None
         
-        elif token.type == TokenType.THOR:
-            self.advance()
-            return {"type": "thor"}
+        if not self.is_at_end() and self.peek().type == TokenType.NUMBER:
+            size = self.advance().value
         
-        elif token.type == TokenType.THORNUM:
-            self.advance()
-            return {"type": "thornum"}
+        if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
+            name = self.advance().value
+        else:
+            print(f"Error at line {token.line_number}: Expected array name")
+            sys.exit(1)
         
-        elif token.type == TokenType.HULK:
-            self.advance()
-            args = []
-            if not self.is_at_end() and (self.peek().type == TokenType.STRING or self.peek().type == TokenType.NUMBER):
-                args.append(self.advance().value)
-            return {"type": "hulk", "args": args}
+        return {"type": "doctorstrange", "name": name, "size": size}
+    
+    def parse_blackpanther(self, token):
+        """Parse a blackpanther array input statement"""
+        self.advance()
+        target = None
+        content = None
         
-        elif token.type == TokenType.DOCTORSTRANGE:
-            self.advance()
-            size = None
-            name = None
-            
-            if not self.is_at_end() and self.peek().type == TokenType.NUMBER:
-                size = self.advance().value
+        if not self.is_at_end() and self.peek().type == TokenType.INTO:
+            self.advance()  # Consume "into"
             
-            if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
-                name = self.advance().value
-            else:
-                print(f"Error at line {token.line_number}: Expected array name")
-                sys.exit(1)
-            
-            return {"type": "doctorstrange", "name": name, "size": size}
+            if not self.is_at_end():
+                if self.peek().type == TokenType.IDENTIFIER:
+                    target = self.advance().value
+                elif self.peek().type == TokenType.NUMBER:
+                    target = self.advance().value
         
-        elif token.type == TokenType.BLACKPANTHER:
-            self.advance()
-            target = None
-            content = None
-            
-            if not self.is_at_end() and self.peek().type == TokenType.INTO:
-                self.advance()  # Consume "into"
-                
-                if not self.is_at_end():
-                    if self.peek().type == TokenType.IDENTIFIER:
-                        target = self.advance().value
-                    elif self.peek().type == TokenType.NUMBER:
-                        target = self.advance().value
-            
-            if not self.is_at_end() and self.peek().type == TokenType.STRING:
-                content = self.advance().value
-            
-            return {"type": "blackpanther", "target": target, "content": content}
+        if not self.is_at_end() and self.peek().type == TokenType.STRING:
+            content = self.advance().value
         
-        elif token.type == TokenType.CAPTAINAMERICA:
-            self.advance()
-            target = None
-            
-            if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
-                target = self.advance().value
-            
-            return {"type": "captainamerica", "target": target}
+        return {"type": "blackpanther", "target": target, "content": content}
+    
+    def parse_captainamerica(self, token):
+        """Parse a captainamerica array output statement"""
+        self.advance()
+        target = None
         
-        elif token.type == TokenType.STARLORD:
-            self.advance()
-            text = None
-            
-            if not self.is_at_end() and self.peek().type == TokenType.STRING:
-                text = self.advance().value
-            else:
-                print(f"Error at line {token.line_number}: Expected string after starlord")
-                sys.exit(1)
-            
-            return {"type": "starlord", "text": text}
+        if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
+            target = self.advance().value
         
-        elif token.type == TokenType.DEADPOOL:
-            self.advance()
-            return {"type": "deadpool"}
+        return {"type": "captainamerica", "target": target}
+    
+    def parse_starlord(self, token):
+        """Parse a starlord print statement"""
+        self.advance()
+        text = None
         
-        elif token.type == TokenType.LOKI:
-            self.advance()
-            return {"type": "loki"}
+        if not self.is_at_end() and self.peek().type == TokenType.STRING:
+            text = self.advance().value
+        else:
+            print(f"Error at line {token.line_number}: Expected string after starlord")
+            sys.exit(1)
         
-        elif token.type == TokenType.FALCON:
-            self.advance()
-            name = None
-            
-            if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
-                name = self.advance().value
-                if name.endswith(':'):
-                    name = name[:-1]  # Remove trailing colon
-            
-            return {"type": "falcon", "name": name}
+        return {"type": "starlord", "text": text}
+    
+    def parse_falcon(self, token):
+        """Parse a falcon label definition"""
+        self.advance()
+        name = None
         
-        elif token.type == TokenType.HAWKEYE:
-            self.advance()
-            target = None
-            
-            if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
-                target = self.advance().value
-            
-            return {"type": "hawkeye", "target": target}
+        if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
+            name = self.advance().value
+            if name.endswith(':'):
+                name = name[:-1]  # Remove trailing colon
         
-        elif token.type == TokenType.SPIDERMAN:
-            self.advance()
-            target = None
-            left = None
-            op = None
-            right = None
-            
-            if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
-                target = self.advance().value
-            
-            if not self.is_at_end():
-                if self.peek().type == TokenType.VISION:
-                    left = "vision"
-                    self.advance()
-                elif self.peek().type == TokenType.NUMBER:
-                    left = self.advance().value
-            
-            if not self.is_at_end() and self.peek().type == TokenType.OPERATOR:
-                op = self.advance().value
-            
-            if not self.is_at_end():
-                if self.peek().type == TokenType.EMPTY:
-                    right = "empty"
-                    self.advance()
-                elif self.peek().type == TokenType.NUMBER:
-                    right = self.advance().value
-                elif self.peek().type == TokenType.VISION:
-                    right = "vision"
-                    self.advance()
-            
-            return {"type": "spiderman", "target": target, "left": left, "op": op, "right": right}
+        return {"type": "falcon", "name": name}
+    
+    def parse_hawkeye(self, token):
+        """Parse a hawkeye goto statement"""
+        self.advance()
+        target = None
         
-        elif token.type == TokenType.ADD or token.type == TokenType.SUB:
-            op_type = "add" if token.type == TokenType.ADD else "sub"
-            self.advance()
-            left = None
-            left_is_cell = False
-            right = None
-            right_is_cell = False
-            
-            if not self.is_at_end():
-                if self.peek().type == TokenType.VISION:
-                    left = "vision"
-                    self.advance()
-                elif self.peek().type == TokenType.NUMBER:
-                    left = self.advance().value
-                elif self.peek().type == TokenType.CELL_REF:
-                    left = self.advance().value
-                    left_is_cell = True
-            
-            if not self.is_at_end():
-                if self.peek().type == TokenType.NUMBER:
-                    right = self.advance().value
-                elif self.peek().type == TokenType.VISION:
-                    right = "vision"
-                    self.advance()
-                elif self.peek().type == TokenType.CELL_REF:
-                    right = self.advance().value
-                    right_is_cell = True
-            
-            return { "type": op_type, "left": left, "right": right, "left_is_cell": left_is_cell, "right_is_cell": right_is_cell}
+        if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
+            target = self.advance().value
+            self.check_jump(token, target)
         
-        elif token.type == TokenType.THANOS:
-            self.advance()
-            return {"type": "thanos"}
+        return {"type": "hawkeye", "target": target}
+    
+    def parse_spiderman(self, token):
+        """Parse a spiderman conditional jump"""
+        self.advance()
+        target = None
+        left = None
+        op = None
+        right = None
         
-        elif token.type == TokenType.IDENTIFIER:
-            # This could be a flash (loop) call
-            name = self.advance().value
-            if name in self.flashes:
-                return {"type": "flash_call", "name": name}
+        if not self.is_at_end() and self.peek().type == TokenType.IDENTIFIER:
+            target = self.advance().value
+            self.check_jump(token, target)
         
-        else:
-            # Skip unknown token
-            self.advance()
+        if not self.is_at_end():
+            if self.peek().type == TokenType.VISION:
+                left = "vision"
+                self.advance()
+            elif self.peek().type == TokenType.NUMBER:
+                left = self.advance().value
+        
+        if not self.is_at_end() and self.peek().type == TokenType.OPERATOR:
+            op = self.advance().value
+        
+        if not self.is_at_end():
+            if self.peek().type == TokenType.EMPTY:
+                right = "empty"
+                self.advance()
+            elif self.peek().type == TokenType.NUMBER:
+                right = self.advance().value
+            elif self.peek().type == TokenType.VISION:
+                right = "vision"
+                self.advance()
+        
+        return {"type": "spiderman", "target": target, "left": left, "op": op, "right": right}
+    
+    def parse_arithmetic(self, token):
+        """Parse an add or sub statement"""
+        op_type = "add" if token.type == TokenType.ADD else "sub"
+        self.advance()
+        left = None
+        left_is_cell = False
+        right = None
+        right_is_cell = False
+        
+        if not self.is_at_end():
+            if self.peek().type == TokenType.VISION:
+                left = "vision"
+                self.advance()
+            elif self.peek().type == TokenType.NUMBER:
+                left = self.advance().value
+            elif self.peek().type == TokenType.CELL_REF:
+                left = self.advance().value
+                left_is_cell = True
         
+        if not self.is_at_end():
+            if self.peek().type == TokenType.NUMBER:
+                right = self.advance().value
+            elif self.peek().type == TokenType.VISION:
+                right = "vision"
+                self.advance()
+            elif self.peek().type == TokenType.CELL_REF:
+                right = self.advance().value
+                right_is_cell = True
+        
+        return { "type": op_type, "left": left, "right": right, "left_is_cell": left_is_cell, "right_is_cell": right_is_cell}
+    
+    def parse_flash(self, token):
+        """Skip a flash (loop) definition; its body is parsed separately"""
+        self.advance()
+        body = self.flash_definitions.get(token)
+        if body is not None:
+            self.current += 1 + len(body)  # Skip the name and the body
+        return None
+    
+    def parse_identifier(self, token):
+        """Parse an identifier, which could be a flash (loop) call"""
+        name = self.advance().value
+        if name in self.flashes:
+            return {"type": "flash_call", "name": name}
         return None
 
+# Consecutive opcodes folded together by the peephole pass: node type -> (folded type, delta)
+FOLDABLE_NODES = {
+    "ironman": ("addcell", 1),
+    "batman": ("addcell", -1),
+    "superman": ("moveptr", 1),
+    "wonderwoman": ("moveptr", -1),
+}
+
+# C statements for nodes that always generate the same code
+FIXED_STATEMENTS = {
+    "ironman": "tape[ptr]++;",
+    "batman": "tape[ptr]--;",
+    "superman": "ptr++;",
+    "wonderwoman": "ptr--;",
+    "thor": "thor();",
+    "thornum": "thornum();",
+    "deadpool": "ptr = 0;",
+}
+
+# Indentation strings for generated C code, built once per nesting level
+INDENTS = tuple("    " * level for level in range(32))
+
+# Generated lines buffered before a chunk of C code is handed to the consumer
+CHUNK_LINES = 4096
+
+# Characters SuperHero names may contain but C identifiers may not ('#', non-ASCII letters)
+C_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_]')
+
 class CodeGenerator:
     """Generate C code from the parsed SuperHero code"""
     
-    def __init__(self, ast, doctorstranges):
+    def __init__(self, ast, doctorstranges, flashes=None):
         self.ast = ast
         self.doctorstranges = doctorstranges
+        self.flashes = flashes or {}  # Flash loop name -> parsed body
+        
+        # C function name of each flash loop. A name that is not a valid C identifier gets a
+        # numbered form; plain names never start with a digit, so the two cannot collide.
+        self.flash_functions = {}
+        for index, name in enumerate(self.flashes):
+            if C_UNSAFE_RE.search(name):
+                self.flash_functions[name] = f"flash_{index}_{C_UNSAFE_RE.sub('_', name)}"
+            else:
+                self.flash_functions[name] = f"flash_{name}"
         self.code = []
+        self.emit = self.code.append  # Bound once; called for every emitted line
         self.indent_level = 0
+        self.in_flash = False
+        
+        # Node generators keyed by node type; doctorstrange arrays are declared with the globals
+        self._dispatch = {
+            "addcell": self.generate_addcell,
+            "moveptr": self.generate_moveptr,
+            "hulk": self.generate_hulk,
+            "starlord": self.generate_starlord,
+            "loki": self.generate_loki,
+            "falcon": self.generate_falcon,
+            "hawkeye": self.generate_hawkeye,
+            "spiderman": self.generate_spiderman,
+            "add": self.generate_add,
+            "sub": self.generate_sub,
+            "blackpanther": self.generate_blackpanther,
+            "captainamerica": self.generate_captainamerica,
+            "flash_call": self.generate_flash_call,
+            "thanos": self.generate_thanos,
+        }
     
     def generate(self):
         """Generate C code from the AST"""
+        return "".join(self.chunks())
+    
+    def take_chunk(self):
+        """Return the lines emitted so far as one chunk and start a new one"""
+        chunk = "\n".join(self.code) + "\n"
+        self.code.clear()  # Cleared in place so the bound self.emit stays valid
+        return chunk
+    
+    def chunks(self):
+        """Generate C code from the AST, yielding it in chunks as it is produced"""
         # Add standard C headers and setup
-        self.code.append("""
+        self.emit("""
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
@@ -549,16 +735,16 @@ class CodeGenerator:
 
         # Add platform-specific headers
         if os.name == 'nt':
-            self.code.append("""
+            self.emit("""
 #include <windows.h>
 #define sleep(x) Sleep((x) * 1000)
 """)
         else:
-            self.code.append("""
+            self.emit("""
 #include <unistd.h>
 """)
 
-        self.code.append("""
+        self.emit("""
 #include <stdint.h>
 
 #define TAPE_SIZE 30000
@@ -577,9 +763,9 @@ void hulk(int direct_val, char direct_char);
         # Define doctorstrange arrays
         for name, size in self.doctorstranges.items():
             size_val = size if size is not None else 1024  # Default size
-            self.code.append(f"uint8_t doctorstrange_{name}[{size_val}] = {{0}};")
+            self.emit(f"uint8_t doctorstrange_{name}[{size_val}] = {{0}};")
         
-        self.code.append("""
+        self.emit("""
 // Helper functions
 void thor() {
     printf("%c\\n", tape[ptr]);
@@ -651,181 +837,444 @@ void captainamerica(uint8_t *source) {
         i++;
     }
     printf("\\n");
-}
-
-int main() {
-""")
+}""")
+        
+        # Each flash loop becomes its own function; prototypes allow calls in any order
+        for function in self.flash_functions.values():
+            self.emit(f"static inline void {function}(void);")
+        
+        self.indent_level = 1
+        for name, body in self.flashes.items():
+            self.emit(f"\nstatic inline void {self.flash_functions[name]}(void) {{")
+            self.in_flash = True
+            for node in self.peephole(body):
+                self.generate_node(node)
+            self.in_flash = False
+            self.emit("    return;\n}")
+            if len(self.code) >= CHUNK_LINES:
+                yield self.take_chunk()
+        
+        self.emit("\nint main() {\n")
         
         # Generate code for the AST
         self.indent_level = 1
-        for node in self.ast:
+        for node in self.peephole(self.ast):
             self.generate_node(node)
+            if len(self.code) >= CHUNK_LINES:
+                yield self.take_chunk()
         
         # Close main function and return 0
-        self.code.append("    return 0;\n}")
+        self.emit("    return 0;\n}")
         
-        return "\n".join(self.code)
+        yield "\n".join(self.code)
+        self.code.clear()
     
     def indent(self):
         """Return the current indentation as a string"""
-        return "    " * self.indent_level
+        return INDENTS[self.indent_level]
+    
+    def peephole(self, nodes):
+        """Fold runs of cell increments/decrements and pointer moves into single nodes"""
+        folded = []
+        i = 0
+        while i < len(nodes):
+            fold = FOLDABLE_NODES.get(nodes[i].get("type"))
+            if not fold:
+                folded.append(nodes[i])
+                i += 1
+                continue
+            
+            # Sum the run of opcodes that fold into the same kind of node
+            fold_type = fold[0]
+            start = i
+            delta = 0
+            while i < len(nodes):
+                fold = FOLDABLE_NODES.get(nodes[i].get("type"))
+                if not fold or fold[0] != fold_type:
+                    break
+                delta += fold[1]
+                i += 1
+            
+            if i - start == 1:
+                folded.append(nodes[start])  # A lone opcode keeps its ++/-- form
+            elif delta:
+                folded.append({"type": fold_type, "delta": delta})
+        
+        return folded
+    
+    def generate_arithmetic(self, node, op):
+        """Generate C code for an add or sub node using the given C operator"""
+        left = node.get("left", "")
+        right = node.get("right", "")
+        
+        # Numeric and #cell left operands both address a tape cell
+        left_expr = "tape[ptr]" if left == "vision" else f"tape[{left}]"
+        
+        if right == "vision":
+            right_expr = "tape[ptr]"
+        elif node.get("right_is_cell", False):
+            right_expr = f"tape[{right}]"
+        else:
+            right_expr = str(right)
+        
+        self.emit(f"{self.indent()}{left_expr} {op}= {right_expr};")
     
     def generate_node(self, node):
         """Generate C code for a specific AST node"""
+        # Each node emits one string into self.code; multi-line statements embed
+        # their newlines instead of emitting a small string per line
         if not node:
             return
         
         node_type = node.get("type", "")
         
-        if node_type == "ironman":
-            self.code.append(f"{self.indent()}tape[ptr]++;")
-        
-        elif node_type == "batman":
-            self.code.append(f"{self.indent()}tape[ptr]--;")
-        
-        elif node_type == "superman":
-            self.code.append(f"{self.indent()}ptr++;")
-        
-        elif node_type == "wonderwoman":
-            self.code.append(f"{self.indent()}ptr--;")
+        # Fixed statements are built by plain concatenation rather than f-string formatting
+        statement = FIXED_STATEMENTS.get(node_type)
+        if statement:
+            self.emit(self.indent() + statement)
+            return
         
-        elif node_type == "hulk":
-            args = node.get("args", [])
-            if args and isinstance(args[0], int):
-                self.code.append(f"{self.indent()}hulk({args[0]}, 0);")
-            elif args and isinstance(args[0], str):
-                self.code.append(f"{self.indent()}hulk(-1, '{args[0]}');")
-            else:
-                self.code.append(f"{self.indent()}hulk(-1, 0);")
+        generator = self._dispatch.get(node_type)
+        if generator:
+            generator(node)
+    
+    def generate_addcell(self, node):
+        """Generate C code for a folded run of cell increments/decrements"""
+        delta = node.get("delta", 0)
+        op = "+=" if delta > 0 else "-="
+        self.emit(f"{self.indent()}tape[ptr] {op} {abs(delta)};")
+    
+    def generate_moveptr(self, node):
+        """Generate C code for a folded run of pointer moves"""
+        delta = node.get("delta", 0)
+        op = "+=" if delta > 0 else "-="
+        self.emit(f"{self.indent()}ptr {op} {abs(delta)};")
+    
+    def generate_hulk(self, node):
+        """Generate C code for a hulk input node"""
+        args = node.get("args", [])
+        if args and isinstance(args[0], int):
+            self.emit(f"{self.indent()}hulk({args[0]}, 0);")
+        elif args and isinstance(args[0], str):
+            self.emit(f"{self.indent()}hulk(-1, '{args[0]}');")
+        else:
+            self.emit(self.indent() + "hulk(-1, 0);")
+    
+    def generate_starlord(self, node):
+        """Generate C code for a starlord print node"""
+        text = node.get("text", "")
+        self.emit(f'{self.indent()}printf("{text}\\n");')
+    
+    def generate_loki(self, node):
+        """Generate C code for a loki clear node"""
+        indent = self.indent()
+        self.emit(f'{indent}tape[ptr] = 0;\n{indent}printf("Loki cleared cell %d\\n", ptr);')
+    
+    def generate_falcon(self, node):
+        """Generate C code for a falcon label"""
+        name = node.get("name", "")
+        self.emit(f"{self.indent()[:-4]}{name}:")
+    
+    def generate_hawkeye(self, node):
+        """Generate C code for a hawkeye goto"""
+        target = node.get("target", "")
+        self.emit(f"{self.indent()}goto {target};")
+    
+    def generate_spiderman(self, node):
+        """Generate C code for a spiderman conditional jump"""
+        target = node.get("target", "")
+        left = node.get("left", "")
+        op = node.get("op", "")
+        right = node.get("right", "")
         
-        elif node_type == "thor":
-            self.code.append(f"{self.indent()}thor();")
+        left_expr = "tape[ptr]" if left == "vision" else str(left)
         
-        elif node_type == "thornum":
-            self.code.append(f"{self.indent()}thornum();")
+        if right == "empty":
+            right_expr = "0"
+        elif right == "vision":
+            right_expr = "tape[ptr]"
+        else:
+            right_expr = str(right)
         
-        elif node_type == "starlord":
-            text = node.get("text", "")
-            self.code.append(f'{self.indent()}printf("{text}\\n");')
+        indent = self.indent()
+        self.emit(f"{indent}if ({left_expr} {op} {right_expr}) {{\n{indent}    goto {target};\n{indent}}}")
+    
+    def generate_add(self, node):
+        """Generate C code for an add node"""
+        self.generate_arithmetic(node, "+")
+    
+    def generate_sub(self, node):
+        """Generate C code for a sub node"""
+        self.generate_arithmetic(node, "-")
+    
+    def generate_blackpanther(self, node):
+        """Generate C code for a blackpanther array input node"""
+        target = node.get("target", None)
+        content = node.get("content", None)
         
-        elif node_type == "deadpool":
-            self.code.append(f"{self.indent()}ptr = 0;")
+        if target is None:
+            target_expr = "tape + ptr"
+        elif isinstance(target, str) and target in self.doctorstranges:
+            target_expr = f"doctorstrange_{target}"
+        else:
+            target_expr = f"tape + {target}"
         
-        elif node_type == "loki":
-            self.code.append(f"{self.indent()}tape[ptr] = 0;")
-            self.code.append(f'{self.indent()}printf("Loki cleared cell %d\\n", ptr);')
+        content_expr = f"\"{content}\"" if content is not None else "NULL"
         
-        elif node_type == "falcon":
-            name = node.get("name", "")
-            self.code.append(f"{self.indent()[:-4]}{name}:")
+        self.emit(f"{self.indent()}blackpanther({target_expr}, {content_expr});")
+    
+    def generate_captainamerica(self, node):
+        """Generate C code for a captainamerica array output node"""
+        target = node.get("target", None)
         
-        elif node_type == "hawkeye":
-            target = node.get("target", "")
-            self.code.append(f"{self.indent()}goto {target};")
+        if target is None:
+            source_expr = "tape + ptr"
+        elif target in self.doctorstranges:
+            source_expr = f"doctorstrange_{target}"
+        else:
+            source_expr = "tape + ptr"
         
-        elif node_type == "spiderman":
-            target = node.get("target", "")
-            left = node.get("left", "")
-            op = node.get("op", "")
-            right = node.get("right", "")
-            
-            left_expr = "tape[ptr]" if left == "vision" else str(left)
-            
-            if right == "empty":
-                right_expr = "0"
-            elif right == "vision":
-                right_expr = "tape[ptr]"
-            else:
-                right_expr = str(right)
-            
-            self.code.append(f"{self.indent()}if ({left_expr} {op} {right_expr}) {{")
-            self.code.append(f"{self.indent()}    goto {target};")
-            self.code.append(f"{self.indent()}}}")
-        
-        elif node_type == "add":
-            left = node.get("left", "")
-            right = node.get("right", "")
-            left_is_cell = node.get("left_is_cell", False)
-            right_is_cell = node.get("right_is_cell", False)
-            
-            if left == "vision":
-                left_expr = "tape[ptr]"
-            elif left_is_cell:
-                left_expr = f"tape[{left}]"
-            else:
-                left_expr = f"tape[{left}]"
+        self.emit(f"{self.indent()}captainamerica({source_expr});")
+    
+    def generate_flash_call(self, node):
+        """Generate C code for a flash loop call"""
+        self.emit(f"{self.indent()}{self.flash_functions[node['name']]}();")
+    
+    def generate_thanos(self, node):
+        """Generate C code for a thanos program end"""
+        indent = self.indent()
+        # Inside a flash function there is no main() to return from
+        end = "exit(0);" if self.in_flash else "return 0;"
+        self.emit(f'{indent}printf("Thanos snapped his fingers...\\n");\n{indent}{end}')
 
-            if right == "vision":
-                right_expr = "tape[ptr]"
-            elif right_is_cell:
-                right_expr = f"tape[{right}]"
-            else:
-                right_expr = str(right)
-            
-            self.code.append(f"{self.indent()}{left_expr} += {right_expr};")
-        
-        elif node_type == "sub":
-            left = node.get("left", "")
-            right = node.get("right", "")
-            left_is_cell = node.get("left_is_cell", False)
-            right_is_cell = node.get("right_is_cell", False)
-            
-            if left == "vision":
-                left_expr = "tape[ptr]"
-            elif left_is_cell:
-                left_expr = f"tape[{left}]"
-            else:
-                left_expr = f"tape[{left}]"
-            
-            if right == "vision":
-                right_expr = "tape[ptr]"
-            elif right_is_cell:
-                right_expr = f"tape[{right}]"
-            else:
-                right_expr = str(right)
-            
-            self.code.append(f"{self.indent()}{left_expr} -= {right_expr};")
-        
-        elif node_type == "doctorstrange":
-            # Already declared in the globals section
+_compiler_digest = None
+
+def compiler_digest():
+    """Return a hash of this compiler's own source, computed once per process"""
+    # Any edit to the lexer, parser or code generator changes it and so invalidates the caches
+    global _compiler_digest
+    if _compiler_digest is None:
+        try:
+            with open(__file__, 'rb') as f:
+                _compiler_digest = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            _compiler_digest = __version__
+    return _compiler_digest
+
+def write_cache_file(cache_file, data):
+    """Atomically write bytes to a cache file, creating its directory if needed"""
+    # Write to a private temporary file and rename it so readers never see a partial file
+    temp_cache_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_cache_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_cache_file, cache_file)
+    except OSError:
+        try:
+            os.unlink(temp_cache_file)
+        except OSError:
+            pass
+        raise
+
+def load_or_parse(source_bytes, use_cache=True, verbose=False):
+    """Lex and parse raw source bytes, reusing the cached AST of an identical source"""
+    import pickle  # Not needed when the executable cache already hit
+    
+    # The key covers everything that can change the parse result
+    key = hashlib.sha256(f"{__version__}\0{compiler_digest()}\0{sys.version}\0".encode('utf-8') + source_bytes).hexdigest()
+    cache_file = os.path.join(CACHE_DIR, "ast", key + ".pkl")
+    
+    # A verbose build re-lexes so it can show the tokens
+    if use_cache and not verbose:
+        try:
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # A missing or unreadable entry is simply rebuilt
+    
+    # Decode only when the source actually has to be lexed
+    source_code = source_bytes.decode('utf-8')
+    if '\r' in source_code:
+        source_code = source_code.replace('\r\n', '\n').replace('\r', '\n')
+    
+    lexer = SuperHeroLexer()
+    tokens = lexer.tokenize(source_code)
+    
+    if verbose:
+        print("Tokens:")
+        for token in tokens:
+            print(f"  {token}")
+    
+    parser = SuperHeroParser(tokens, lexer.declarations)
+    ast = parser.parse()
+    result = (ast, parser.doctorstranges, parser.flash_bodies)
+    
+    if use_cache:
+        try:
+            write_cache_file(cache_file, pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            if verbose:
+                print(f"Could not write AST cache {cache_file}: {e}")
+    
+    return result
+
+def find_compiler(use_cache=True):
+    """Locate a C compiler, returning its name and path or None if none is installed"""
+    import json
+    
+    # The lookup result only depends on PATH, so remember it until PATH changes
+    path_key = hashlib.blake2s(os.environ.get('PATH', '').encode('utf-8'), digest_size=8).hexdigest()
+    record_file = os.path.join(CACHE_DIR, "compiler.json")
+    
+    if use_cache:
+        try:
+            with open(record_file, 'r') as f:
+                record = json.load(f)
+            if record["path_key"] == path_key and os.path.exists(record["path"]):
+                return record["name"], record["path"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    
+    import shutil
+    
+    candidates = ['gcc', 'cl'] if os.name == 'nt' else ['gcc']
+    for name in candidates:
+        path = shutil.which(name)
+        if path:
+            if use_cache:
+                record = {"path_key": path_key, "name": name, "path": path}
+                try:
+                    write_cache_file(record_file, json.dumps(record).encode('utf-8'))
+                except OSError:
+                    pass
+            return name, path
+    return None
+
+def probe_compiler(name, path, use_cache=True):
+    """Return the version, release flags and native CPU target of a C compiler, probing once per binary and host"""
+    import json
+    import platform
+    
+    # A probe stays valid until the compiler binary is replaced or the cache is read
+    # from another machine, whose CPU may resolve -march=native differently
+    compiler_stat = os.stat(path)
+    identity = {"path": path, "mtime_ns": compiler_stat.st_mtime_ns, "size": compiler_stat.st_size,
+                "host": f"{platform.node()} {platform.machine()}"}
+    record_file = os.path.join(CACHE_DIR, "compiler.json")
+    
+    record = None
+    if use_cache:
+        try:
+            with open(record_file, 'r') as f:
+                record = json.load(f)
+            probe = record["probe"]
+            if all(probe[field] == value for field, value in identity.items()):
+                return probe["version"], probe["release_flags"], probe["target"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    
+    import subprocess
+    import tempfile
+    
+    version = ""
+    target = ""
+    if name == 'gcc':
+        try:
+            result = subprocess.run([path, '--version'], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            version = result.stdout.decode('utf-8', 'replace').partition('\n')[0].strip()
+        except OSError:
             pass
         
-        elif node_type == "blackpanther":
-            target = node.get("target", None)
-            content = node.get("content", None)
-            
-            if target is None:
-                target_expr = "tape + ptr"
-            elif isinstance(target, str) and target in self.doctorstranges:
-                target_expr = f"doctorstrange_{target}"
-            else:
-                target_expr = f"tape + {target}"
-            
-            content_expr = f"\"{content}\"" if content is not None else "NULL"
-            
-            self.code.append(f"{self.indent()}blackpanther({target_expr}, {content_expr});")
-        
-        elif node_type == "captainamerica":
-            target = node.get("target", None)
-            
-            if target is None:
-                source_expr = "tape + ptr"
-            elif target in self.doctorstranges:
-                source_expr = f"doctorstrange_{target}"
-            else:
-                source_expr = "tape + ptr"
-            
-            self.code.append(f"{self.indent()}captainamerica({source_expr});")
-        
-        elif node_type == "flash_call":
-            name = node.get("name", "")
-            self.code.append(f"{self.indent()}// Flash loop: {name}")
+        # Keep only the optional flags this gcc and its linker accept
+        release_flags = ['-O2']
+        with tempfile.TemporaryDirectory() as probe_dir:
+            for flag in ('-flto', '-march=native'):
+                try:
+                    result = subprocess.run([path, flag, '-x', 'c', '-', '-o', os.path.join(probe_dir, 'probe')],
+                                           input=b"int main(void) { return 0; }\n",
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                except OSError:
+                    continue
+                if result.returncode == 0:
+                    release_flags.append(flag)
         
-        elif node_type == "thanos":
-            self.code.append(f'{self.indent()}printf("Thanos snapped his fingers...\\n");')
-            self.code.append(f"{self.indent()}return 0;")
+        # Executables built with -march=native only run on CPUs like this one, so name the CPU
+        if '-march=native' in release_flags:
+            try:
+                result = subprocess.run([path, '-march=native', '-Q', '--help=target'],
+                                       stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                for line in result.stdout.decode('utf-8', 'replace').splitlines():
+                    fields = line.split()
+                    if len(fields) == 2 and fields[0] == '-march=':
+                        target = f"{platform.machine()} {fields[1]}"
+                        break
+            except OSError:
+                pass
+            if not target:
+                target = identity["host"]
+    else:
+        # cl prints its version banner on stderr when run without arguments
+        try:
+            result = subprocess.run([path], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            version = result.stderr.decode('utf-8', 'replace').partition('\n')[0].strip()
+        except OSError:
+            pass
+        release_flags = ['/O2']
+    
+    if use_cache and isinstance(record, dict):
+        record["probe"] = dict(identity, version=version, release_flags=release_flags, target=target)
+        try:
+            write_cache_file(record_file, json.dumps(record).encode('utf-8'))
+        except OSError:
+            pass
+    
+    return version, release_flags, target
 
-def compile_superhero(source_file, output_file=None, verbose=False):
+def pipe_to_compiler(command, chunks):
+    """Run a compiler reading C source from stdin, writing the chunks as they are generated"""
+    import subprocess
+    import threading
+    
+    process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    
+    # Drain stderr concurrently so a chatty compiler can never block our writes
+    diagnostics = []
+    reader = threading.Thread(target=lambda: diagnostics.append(process.stderr.read()))
+    reader.start()
+    
+    try:
+        for chunk in chunks:
+            process.stdin.write(chunk.encode('utf-8'))
+    except BrokenPipeError:
+        pass  # The compiler stopped reading early; its diagnostics say why
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        # Closing stdin also releases any compiler subprocess still waiting for input
+        try:
+            process.stdin.close()
+        except BrokenPipeError:
+            pass
+        reader.join()
+        process.stderr.close()
+        process.wait()
+    
+    return process.returncode, diagnostics[0] if diagnostics else b""
+
+def link_or_copy(source, destination):
+    """Hard-link source to destination, falling back to a copy where links are unsupported"""
+    if os.path.lexists(destination):
+        os.unlink(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        import shutil
+        shutil.copy2(source, destination)
+
+def compile_superhero(source_file, output_file=None, verbose=False, use_cache=True, release=False):
     """Compile a SuperHero source file to an executable"""
     if not output_file:
         output_file = os.path.splitext(source_file)[0]
@@ -833,61 +1282,121 @@ def compile_superhero(source_file, output_file=None, verbose=False):
             output_file += '.exe'
     
     try:
-        with open(source_file, 'r') as f:
-            source_code = f.read()
+        # Kept as bytes: the cache keys hash them directly and a cache hit never decodes
+        with open(source_file, 'rb') as f:
+            source_bytes = f.read()
     except FileNotFoundError:
         print(f"Error: Source file '{source_file}' not found")
         return 1
     
-    lexer = SuperHeroLexer()
-    tokens = lexer.tokenize(source_code)
+    compiler = find_compiler(use_cache)
+    if compiler is None:
+        if os.name == 'nt':
+            print("Error: No C compiler found. Please install MinGW or MSVC.")
+        else:
+            print("Error: No C compiler found. Please install GCC.")
+        return 1
+    compiler_name, compiler_path = compiler
+    compiler_cmd = [compiler_path]
     
-    if verbose:
-        print("Tokens:")
-        for token in tokens:
-            print(f"  {token}")
+    compiler_version = ""
+    compiler_target = ""
+    if release:
+        compiler_version, release_flags, compiler_target = probe_compiler(compiler_name, compiler_path, use_cache)
+        compiler_cmd += release_flags
+        if verbose:
+            print(f"Release build with {compiler_version or compiler_name}: {' '.join(release_flags)}")
     
-    parser = SuperHeroParser(tokens)
-    ast = parser.parse()
+    cached_binary = None
+    if use_cache:
+        # The same source, code generator, compiler binary and flags always build the same executable
+        compiler_stat = os.stat(compiler_path)
+        fingerprint = (f"{__version__}\0{compiler_digest()}\0{os.name}\0{compiler_cmd!r}\0{compiler_version}\0{compiler_target}\0"
+                       f"{compiler_stat.st_mtime_ns}\0{compiler_stat.st_size}\0")
+        key = hashlib.sha256(fingerprint.encode('utf-8') + source_bytes).hexdigest()
+        cached_binary = os.path.join(CACHE_DIR, "bin", key)
+        
+        # A verbose build always runs every stage so it can show the tokens, AST and C code
+        if not verbose and os.path.exists(cached_binary):
+            try:
+                link_or_copy(cached_binary, output_file)
+                if os.name != 'nt':
+                    os.chmod(output_file, 0o755)
+                print(f"Successfully compiled {source_file} to {output_file}")
+                return 0
+            except OSError:
+                pass
+    
+    try:
+        ast, doctorstranges, flash_bodies = load_or_parse(source_bytes, use_cache, verbose)
+    except UnicodeDecodeError as e:
+        print(f"Error: Source file '{source_file}' is not valid UTF-8 ({e.reason} at byte {e.start})")
+        return 1
     
     if verbose:
         print("\nAST:")
         for node in ast:
             print(f"  {node}")
+        for name, body in flash_bodies.items():
+            print(f"  flash {name}: {body}")
     
-    code_gen = CodeGenerator(ast, parser.doctorstranges)
-    c_code = code_gen.generate()
-    
-    with tempfile.NamedTemporaryFile(suffix='.c', delete=False) as temp_file:
-        temp_filename = temp_file.name
-        temp_file.write(c_code.encode('utf-8'))
+    code_gen = CodeGenerator(ast, doctorstranges, flash_bodies)
     
     if verbose:
-        print(f"\nGenerated C code saved to {temp_filename}")
+        c_code = code_gen.generate()
+        print("\nGenerated C code:")
         print(c_code)
+        c_chunks = (c_code,)
+    else:
+        c_chunks = code_gen.chunks()
     
+    temp_filename = None
     try:
-        if os.name == 'nt':
-            if shutil.which('gcc'):
-                compiler_cmd = ['gcc']
-            elif shutil.which('cl'):
-                compiler_cmd = ['cl']
-            else:
-                print("Error: No C compiler found. Please install MinGW or MSVC.")
-                return 1
+        if compiler_name == 'gcc':
+            # gcc reads the C source from stdin as it is generated and keeps its own
+            # intermediates in pipes, so the whole program never sits in memory at once
+            returncode, diagnostics = pipe_to_compiler(
+                compiler_cmd + ['-x', 'c', '-', '-pipe', '-o', output_file], c_chunks)
         else:
-            compiler_cmd = ['gcc']
+            # Only the MSVC path needs these, so gcc builds never import them
+            import subprocess
+            import tempfile
+            
+            c_code = "".join(c_chunks)
             
-        result = subprocess.run(compiler_cmd + [temp_filename, '-o', output_file], 
-                               capture_output=True, text=True)
+            # MSVC cannot compile from stdin, so hand it a temporary file written
+            # straight through the descriptor, without Python's buffered file layers
+            fd, temp_filename = tempfile.mkstemp(suffix='.c')
+            try:
+                data = memoryview(c_code.encode('utf-8'))
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                os.close(fd)
+            
+            # cl prints its diagnostics on stdout, so fold it into the captured stream
+            result = subprocess.run(compiler_cmd + [temp_filename, '-o', output_file], 
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            returncode, diagnostics = result.returncode, result.stdout
         
-        if result.returncode != 0:
-            print(f"Error compiling C code: {result.stderr}")
+        if returncode != 0:
+            print(f"Error compiling C code: {diagnostics.decode('utf-8', 'replace')}")
             return 1
         
         if os.name != 'nt':
             os.chmod(output_file, 0o755)
         
+        if cached_binary:
+            # Publish under a temporary name first so a concurrent build never links a partial file
+            temp_cached_binary = f"{cached_binary}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(os.path.dirname(cached_binary), exist_ok=True)
+                link_or_copy(output_file, temp_cached_binary)
+                os.replace(temp_cached_binary, cached_binary)
+            except OSError as e:
+                if verbose:
+                    print(f"Could not cache executable {cached_binary}: {e}")
+        
         print(f"Successfully compiled {source_file} to {output_file}")
         return 0
     
@@ -895,24 +1404,130 @@ def compile_superhero(source_file, output_file=None, verbose=False):
         print(f"Error during compilation: {e}")
         return 1
     finally:
-        try:
-            os.unlink(temp_filename)
-        except:
-            pass
+        if temp_filename:
+            try:
+                os.unlink(temp_filename)
+            except:
+                pass
 
-def main():
+def compile_job(job):
+    """Compile one (source, output, verbose, use_cache, release) job, turning a fatal error into a status"""
+    source, output_file, verbose, use_cache, release = job
+    try:
+        return compile_superhero(source, output_file, verbose, use_cache, release)
+    except SystemExit as e:
+        # Lexer and parser errors exit; keep them from taking down the other builds
+        return e.code if isinstance(e.code, int) else 1
+    except Exception as e:
+        # Any other per-file failure (unreadable source, bad encoding, ...) fails only this source
+        print(f"Error: Could not compile '{source}': {e}")
+        return 1
+    finally:
+        sys.stdout.flush()
+
+USAGE = """usage: superhero_compiler.py [-h] [-o OUTPUT] [-v] [--no-cache] [--release] [-j JOBS] source [source ...]
+
+SuperHero Programming Language Compiler
+
+positional arguments:
+  source                 Source file(s) (.hero)
+
+options:
+  -h, --help             Show this help message and exit
+  -o, --output OUTPUT    Output executable file (single source only)
+  -v, --verbose          Verbose output
+  --no-cache             Do not read or write the AST and executable caches
+  --release              Optimize the executable (-O2, plus -flto and -march=native where supported)
+  -j, --jobs JOBS        Number of sources to compile in parallel (default: CPU count)"""
+
+def usage_error(message):
+    """Report a command line error the way argparse did and return its exit status"""
+    print(USAGE.partition('\n')[0], file=sys.stderr)
+    print(f"superhero_compiler.py: error: {message}", file=sys.stderr)
+    return 2
+
+def main(argv=None):
     """Main entry point for the SuperHero compiler"""
-    parser = argparse.ArgumentParser(description='SuperHero Programming Language Compiler')
-    parser.add_argument('source', help='Source file (.hero)')
-    parser.add_argument('-o', '--output', help='Output executable file')
-    parser.add_argument('-v', '--verbose', action='store_true', help='Verbose output')
+    # A hand-rolled parse keeps argparse's import and setup off every compile
+    argv = sys.argv[1:] if argv is None else argv
+    sources = []
+    output = None
+    verbose = False
+    use_cache = True
+    release = False
+    jobs_arg = None
+    
+    i = 0
+    options_done = False
+    while i < len(argv):
+        arg = argv[i]
+        i += 1
+        
+        if options_done or arg == '-' or not arg.startswith('-'):
+            sources.append(arg)
+            continue
+        if arg == '--':
+            options_done = True
+            continue
+        
+        # Options taking a value accept "-o X", "-oX", "--output X" and "--output=X"
+        name, has_value, value = arg.partition('=') if arg.startswith('--') else (arg[:2], bool(arg[2:]), arg[2:])
+        if name in ('-o', '--output', '-j', '--jobs'):
+            if not has_value:
+                if i == len(argv):
+                    return usage_error(f"argument {name}: expected one argument")
+                value = argv[i]
+                i += 1
+            if name in ('-o', '--output'):
+                output = value
+            else:
+                jobs_arg = value
+        elif has_value:
+            return usage_error(f"unrecognized arguments: {arg}")
+        elif name in ('-h', '--help'):
+            print(USAGE)
+            return 0
+        elif name in ('-v', '--verbose'):
+            verbose = True
+        elif name == '--no-cache':
+            use_cache = False
+        elif name == '--release':
+            release = True
+        else:
+            return usage_error(f"unrecognized arguments: {arg}")
+    
+    if not sources:
+        return usage_error("the following arguments are required: source")
+    if output and len(sources) > 1:
+        return usage_error("-o/--output can only be used with a single source file")
+    
+    if jobs_arg is None:
+        max_jobs = os.cpu_count() or 1
+    else:
+        try:
+            max_jobs = int(jobs_arg)
+        except ValueError:
+            return usage_error(f"argument -j/--jobs: invalid int value: '{jobs_arg}'")
+        if max_jobs < 1:
+            return usage_error("-j/--jobs must be at least 1")
+    
+    for source in sources:
+        if not source.endswith('.hero'):
+            print(f"Warning: Source file '{source}' doesn't have .hero extension")
     
-    args = parser.parse_args()
+    # Each source is its own program with its own main(), so each gets its own executable
+    jobs = [(source, output, verbose, use_cache, release) for source in sources]
     
-    if not args.source.endswith('.hero'):
-        print("Warning: Source file doesn't have .hero extension")
+    if len(jobs) > 1 and max_jobs > 1:
+        # Separate processes sidestep the GIL for the lex/parse/codegen work
+        from concurrent.futures import ProcessPoolExecutor
+        sys.stdout.flush()
+        with ProcessPoolExecutor(max_workers=min(max_jobs, len(jobs))) as executor:
+            statuses = list(executor.map(compile_job, jobs))
+    else:
+        statuses = [compile_job(job) for job in jobs]
     
-    return compile_superhero(args.source, args.output, args.verbose)
+    return 1 if any(statuses) else 0
 
 if __name__ == "__main__":
     sys.exit(main())